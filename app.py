@@ -1,149 +1,523 @@
 import os
+import sys
+import logging
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
-import json
+import orjson
 import re
+import time
+import copy
+import hashlib
+import queue
+import atexit
+import threading
+import sqlite3
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, abort
-from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from markupsafe import escape
-from langchain_xai import ChatXAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from graph_orchestrator import run_graph
+from collections import OrderedDict
+from flask import Flask, Response, render_template, request, abort
+from sqlalchemy import DateTime, bindparam, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from models import db, Task
+from prompts import AGENT_PROMPTS
+from graph_orchestrator import run_graph, stream_graph
+from routing import KEYWORD_ROUTE_MIN_SCORE
+from chains import LANGCHAIN_TEMP, create_embeddings
+from semantic_cache import SemanticCache
 
 app = Flask(__name__)
-CORS(app)
+
+# CORS and CSP headers are constant, so they are set directly on every response
+CORS_ORIGIN = os.getenv("CORS_ORIGIN", "*")
+RESPONSE_HEADERS = {
+    "Access-Control-Allow-Origin": CORS_ORIGIN,
+    "Vary": "Origin",
+    "Access-Control-Allow-Methods": "POST, GET",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline'"
+}
+
+@app.before_request
+def short_circuit_preflight():
+    if request.method == "OPTIONS":
+        return "", 204
+
+@app.after_request
+def add_response_headers(response):
+    response.headers.update(RESPONSE_HEADERS)
+    return response
+
+# A 500-character task plus JSON overhead fits well within this; chunked
+# bodies without a Content-Length are capped by MAX_CONTENT_LENGTH
+MAX_REQUEST_BYTES = 4096
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+MAX_TASK_LENGTH = 500
+# Tabs and newlines are allowed; other C0 controls and DEL are not
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
 
 # Database setup
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///office_cube.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'poolclass': QueuePool,
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_pre_ping': True,
+    'connect_args': {'check_same_thread': False}
+}
+db.init_app(app)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456"
+)
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while the task writer commits
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
 
 # Load environment variables from a local .env if present
 load_dotenv()
 
 # Environment vars with defaults
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-XAI_API_KEY = os.getenv("XAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-LANGCHAIN_TEMP = float(os.getenv("LANGCHAIN_TEMP", "0.7"))
-
-# LangChain setup
-if XAI_API_KEY:
-    llm = ChatXAI(model="grok-beta", xai_api_key=XAI_API_KEY, temperature=LANGCHAIN_TEMP)
-elif GOOGLE_API_KEY:
-    llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=LANGCHAIN_TEMP)
-else:
-    # Defer error until first usage to allow importing app without keys (for tests/health)
-    llm = None
-
-# Orchestration logic is now in Officeagents/graph_orchestrator.py
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if LOG_LEVEL not in logging.getLevelNamesMapping():
+    LOG_LEVEL = "INFO"
+
+# LLM clients and agent chains are built in chains.py; orchestration
+# logic is in graph_orchestrator.py
+
+# Sensitive-data keywords: a plain substring scan gates the request, the
+# compiled pattern is only used to redact once a keyword has been seen
+SENSITIVE_WORDS = ("password", "api_key", "credit_card")
+SENSITIVE_SUB_RE = re.compile(r'(' + '|'.join(SENSITIVE_WORDS) + r')\s*[:=]?\s*\S+', re.IGNORECASE)
+
+def contains_sensitive_keyword(task):
+    lowered = task.lower()
+    return any(word in lowered for word in SENSITIVE_WORDS)
+
+# JSON log lines are handed to a QueueListener thread so request handlers
+# never block on stdout
+logger = logging.getLogger("office_cube")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_log_queue = queue.Queue()
+_log_stream_handler = logging.StreamHandler(sys.stdout)
+_log_stream_handler.setFormatter(logging.Formatter("%(message)s"))
+_log_queue_handler = QueueHandler(_log_queue)
+logger.addHandler(_log_queue_handler)
+_log_listener = QueueListener(_log_queue, _log_stream_handler)
+_log_listener.start()
+atexit.register(lambda: _log_listener.stop())
+
+# Threads don't survive fork; a preloaded gunicorn worker starts its own listener
+def _restart_log_listener():
+    global _log_queue, _log_listener
+    _log_queue = queue.Queue()
+    _log_queue_handler.queue = _log_queue
+    _log_listener = QueueListener(_log_queue, _log_stream_handler)
+    _log_listener.start()
+
+os.register_at_fork(after_in_child=_restart_log_listener)
+
+# Timestamps for log lines and /healthz: calls within the same millisecond
+# reuse the last string, and the date/time prefix is formatted once a second
+_timestamp_cache = (0, "")
+_timestamp_ms_cache = (0, "")
+
+def iso_timestamp():
+    global _timestamp_cache, _timestamp_ms_cache
+    now_ms = int(time.time() * 1000)
+    cached_ms, stamp = _timestamp_ms_cache
+    if now_ms == cached_ms:
+        return stamp
+    second, millis = divmod(now_ms, 1000)
+    cached_second, prefix = _timestamp_cache
+    if second != cached_second:
+        prefix = datetime.fromtimestamp(second).isoformat()
+        _timestamp_cache = (second, prefix)
+    stamp = f"{prefix}.{millis:03d}"
+    _timestamp_ms_cache = (now_ms, stamp)
+    return stamp
 
 def log_message(level, message):
     log_entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": iso_timestamp(),
         "level": level,
         "message": message
     }
-    print(json.dumps(log_entry))
+    logger.log(logging.getLevelName(level), orjson.dumps(log_entry).decode())
+
+# Task rows are queued by the request handler and inserted in batches by a
+# daemon thread, so clients don't wait on the SQLite commit
+TASK_WRITE_QUEUE_SIZE = 10000
+TASK_WRITE_QUEUE = queue.Queue(maxsize=TASK_WRITE_QUEUE_SIZE)
+TASK_WRITE_BATCH_SIZE = 2000
+TASK_WRITE_MAX_WAIT = 0.05  # seconds
+TASK_WRITER_STOP_TIMEOUT = 10.0  # seconds
+TASK_WRITE_STOP = object()
+_task_writer = None
+_task_writer_lock = threading.Lock()
+
+# Prebuilt statement: batches run as a single executemany with no per-write
+# ORM or statement compilation work. Timestamps are bound through the
+# DateTime type so they are stored in the same format as ORM writes.
+INSERT_TASK_SQL = text(
+    f"INSERT INTO {Task.__tablename__} (task, response, steps, agents_involved, timestamp) "
+    "VALUES (:task, :response, :steps, :agents_involved, :timestamp)"
+).bindparams(bindparam("timestamp", type_=DateTime))
+
+def write_task_rows(rows):
+    with app.app_context():
+        try:
+            db.session.execute(INSERT_TASK_SQL, rows)
+            db.session.commit()
+        except Exception as e:
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            log_message("ERROR", f"DB write failed for {len(rows)} task(s): {str(e)}")
+
+def _task_writer_loop():
+    while True:
+        row = TASK_WRITE_QUEUE.get()
+        if row is TASK_WRITE_STOP:
+            return
+        rows = [row]
+        stopping = False
+        deadline = time.monotonic() + TASK_WRITE_MAX_WAIT
+        while len(rows) < TASK_WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = TASK_WRITE_QUEUE.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is TASK_WRITE_STOP:
+                stopping = True
+                break
+            rows.append(row)
+        write_task_rows(rows)
+        if stopping:
+            return
+
+def stop_task_writer():
+    # At exit the writer finishes the batch it holds and everything queued
+    # ahead of the sentinel; rows that land after it are written here
+    try:
+        TASK_WRITE_QUEUE.put(TASK_WRITE_STOP, timeout=TASK_WRITER_STOP_TIMEOUT)
+    except queue.Full:
+        log_message("ERROR", "Task write queue full at exit; queued records may be lost")
+        return
+    _task_writer.join(TASK_WRITER_STOP_TIMEOUT)
+    if _task_writer.is_alive():
+        log_message("ERROR", "Task writer did not finish before exit; queued records may be lost")
+        return
+    rows = []
+    while True:
+        try:
+            rows.append(TASK_WRITE_QUEUE.get_nowait())
+        except queue.Empty:
+            break
+    if rows:
+        write_task_rows(rows)
+
+def enqueue_task_record(row):
+    global _task_writer
+    if _task_writer is None:
+        with _task_writer_lock:
+            if _task_writer is None:
+                _task_writer = threading.Thread(target=_task_writer_loop, name="task-writer", daemon=True)
+                _task_writer.start()
+                atexit.register(stop_task_writer)
+    try:
+        TASK_WRITE_QUEUE.put_nowait(row)
+    except queue.Full:
+        # The writer is falling behind; write inline rather than drop the record
+        log_message("ERROR", "Task write queue full; writing record synchronously")
+        write_task_rows([row])
 
 def handle_secret_service(task):
     # Sanitize task by removing sensitive data patterns
-    sanitized_task = re.sub(r'(password|api_key|credit_card)\s*[:=]?\s*\S+', '[REDACTED]', task, flags=re.IGNORECASE)
+    sanitized_task = SENSITIVE_SUB_RE.sub('[REDACTED]', task)
     return {
         "steps": ["Handled by Secret Service"],
         "response": f"Sensitive task '{sanitized_task}' has been processed securely.",
         "agents_involved": ["SecretService"]
     }
 
-def orchestrate_with_langchain(task, max_chains=5):
+# Identical resubmissions (reloads, retries) within the TTL reuse the last
+# result. Entries are copied in and out so callers can't mutate the cache.
+RESULT_CACHE_TTL = 60.0  # seconds
+RESULT_CACHE_SIZE = 1024
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+_result_cache_stats = {"hits": 0, "misses": 0}
+
+def result_cache_key(task, max_chains):
+    # Case and whitespace variants of a task share one entry; the digest keeps
+    # keys small regardless of task length
+    normalized = " ".join(task.lower().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest(), max_chains
+
+def get_cached_result(key):
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is None:
+            _result_cache_stats["misses"] += 1
+            return None
+        result, expires = entry
+        if time.monotonic() >= expires:
+            del _result_cache[key]
+            _result_cache_stats["misses"] += 1
+            return None
+        _result_cache.move_to_end(key)
+        _result_cache_stats["hits"] += 1
+    return copy.deepcopy(result)
+
+def store_cached_result(key, result):
+    with _result_cache_lock:
+        _result_cache[key] = (copy.deepcopy(result), time.monotonic() + RESULT_CACHE_TTL)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+# Paraphrased tasks can reuse an earlier result via embedding similarity,
+# under the same TTL and max_chains rules as the exact cache. Off by default:
+# it needs an embeddings provider (GOOGLE_API_KEY), adds one embedding call
+# to every miss, and like the other answer caches only applies when sampling
+# is deterministic.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "false").lower() == "true" and LANGCHAIN_TEMP == 0
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    embeddings = create_embeddings()
+    if embeddings is not None:
+        semantic_cache = SemanticCache(embeddings, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=RESULT_CACHE_TTL)
+
+def lookup_semantic_cache(task, max_chains):
+    # Returns (cached result or None, task vector to store on a miss)
+    if semantic_cache is None:
+        return None, None
+    try:
+        vector = semantic_cache.embed(task)
+    except Exception as e:
+        log_message("ERROR", f"Semantic cache embedding failed: {str(e)}")
+        return None, None
+    result = semantic_cache.lookup(vector, max_chains)
+    return (copy.deepcopy(result) if result is not None else None), vector
+
+def lookup_precomputed_result(task, cache_key):
+    # Returns (result, None) when the task can be answered without the graph,
+    # otherwise (None, task vector to store in the semantic cache)
+    cached = get_cached_result(cache_key)
+    if cached is not None:
+        return cached, None
+
     # Quick check for sensitive keywords to route to SecretService without LLM
-    if re.search(r'(password|api_key|credit_card)', task, re.IGNORECASE):
-        return handle_secret_service(task)
+    if contains_sensitive_keyword(task):
+        result = handle_secret_service(task)
+        store_cached_result(cache_key, result)
+        return result, None
+
+    # Sensitive tasks are handled above, so they are never sent for embedding
+    return lookup_semantic_cache(task, cache_key[1])
+
+def store_graph_result(cache_key, task_vector, graph_result):
+    log_first_hop(graph_result)
+    result = {
+        "steps": ["Graph orchestration complete"],
+        "response": graph_result["response"],
+        "agents_involved": graph_result["agents_involved"]
+    }
+    store_cached_result(cache_key, result)
+    if task_vector is not None:
+        semantic_cache.store(task_vector, copy.deepcopy(result), cache_key[1])
+    return result
+
+def fallback_result(task, error):
+    # Fallbacks are not cached so the next attempt retries the LLM
+    log_message("ERROR", f"LangChain orchestration error: {str(error)}")
+    return {
+        "steps": ["Fallback: Direct to Orchestration"],
+        "response": f"Task '{task}' processed via fallback. (Error: {str(error)})",
+        "agents_involved": ["Orchestration"]
+    }
+
+def log_first_hop(graph_result):
+    # Which path the graph started on and the keyword scores behind it, so
+    # KEYWORD_ROUTE_MIN_SCORE can be tuned from the logs
+    first_hop = graph_result["first_hop"]
+    path = "Orchestrator route" if first_hop == "Orchestrator" else f"keyword route to {first_hop}"
+    log_message("INFO", f"First hop: {path} (keyword scores: {graph_result['keyword_scores']}, min score: {KEYWORD_ROUTE_MIN_SCORE})")
+
+def orchestrate_with_langchain(task, max_chains=5):
+    cache_key = result_cache_key(task, max_chains)
+    result, task_vector = lookup_precomputed_result(task, cache_key)
+    if result is not None:
+        return result
 
     try:
-        final_response = run_graph(task)
-        return {
-            "steps": ["Graph orchestration complete"],
-            "response": final_response,
-            "agents_involved": ["GraphOrchestrator"]
-        }
+        return store_graph_result(cache_key, task_vector, run_graph(task, max_chains))
     except Exception as e:
-        log_message("ERROR", f"LangChain orchestration error: {str(e)}")
-        return {
-            "steps": ["Fallback: Direct to Orchestration"],
-            "response": f"Task '{task}' processed via fallback. (Error: {str(e)})",
-            "agents_involved": ["Orchestration"]
-        }
+        return fallback_result(task, e)
+
+def stream_orchestration(task, max_chains=5):
+    # Same flow as orchestrate_with_langchain, but yields each agent's reply
+    # as it arrives and ends with {"done": True, **result}
+    cache_key = result_cache_key(task, max_chains)
+    result, task_vector = lookup_precomputed_result(task, cache_key)
+    if result is None:
+        try:
+            graph_result = yield from stream_graph(task, max_chains)
+            result = store_graph_result(cache_key, task_vector, graph_result)
+        except Exception as e:
+            result = fallback_result(task, e)
+    yield {"done": True, **result}
+
+def json_response(payload, status=200):
+    return Response(orjson.dumps(payload), status=status, mimetype="application/json")
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/orchestrate", methods=["POST"])
-def orchestrate():
-    if LOG_LEVEL == "DEBUG":
-        log_message("DEBUG", "Orchestration request received")
-    
-    data = request.get_json()
-    if not data or "task" not in data:
+def parse_orchestrate_request():
+    # Reject oversized bodies before reading or parsing them
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        abort(413, f"Request body must be at most {MAX_REQUEST_BYTES} bytes")
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        abort(400, "Request body must be valid JSON")
+    if not isinstance(data, dict) or "task" not in data:
         abort(400, "Missing 'task' in request body")
-    task_text = data["task"].strip()
-    if len(task_text) > 500 or len(task_text) < 1:
-        abort(400, "Task length must be 1-500 characters")
+    # Cheap type and raw-length checks run before strip() copies the string;
+    # the raw bound leaves room for surrounding whitespace
+    raw_task = data["task"]
+    if not isinstance(raw_task, str):
+        abort(400, "Task must be a string")
+    if not 1 <= len(raw_task) <= 4 * MAX_TASK_LENGTH:
+        abort(400, f"Task length must be 1-{MAX_TASK_LENGTH} characters")
+    task_text = raw_task.strip()
+    if not 1 <= len(task_text) <= MAX_TASK_LENGTH:
+        abort(400, f"Task length must be 1-{MAX_TASK_LENGTH} characters")
+    if CONTROL_CHARS_RE.search(task_text):
+        abort(400, "Task must not contain control characters")
     
     max_chains = data.get("max_chains", 5)
-    if not isinstance(max_chains, int) or max_chains < 1 or max_chains > 10:
+    if type(max_chains) is not int or not 1 <= max_chains <= 10:
         abort(400, "max_chains must be an integer between 1 and 10")
+    return task_text, max_chains
 
-    result = orchestrate_with_langchain(escape(task_text), max_chains=max_chains)
-    
-    # Save to database
-    new_task = Task(
-        task=task_text,
-        response=str(result['response']),
-        steps=json.dumps(result['steps']),
-        agents_involved=json.dumps(result['agents_involved'])
-    )
-    try:
-        db.session.add(new_task)
-        db.session.commit()
-    except Exception as e:
-        try:
-            db.session.rollback()
-        except Exception:
-            pass
-        log_message("ERROR", f"DB write failed: {str(e)}")
-    
-    full_result = {
+def record_task_result(task_text, result):
+    # Save to database (written in the background by the task writer)
+    response_text = result['response']
+    if not isinstance(response_text, str):
+        response_text = str(response_text)
+    # The lists are encoded once: the text goes to the DB row and the same
+    # bytes are embedded in the response body as pre-encoded fragments
+    steps_json = orjson.dumps(result['steps'])
+    agents_json = orjson.dumps(result['agents_involved'])
+    enqueue_task_record({
         "task": task_text,
-        **result
-    }
-    
+        "response": response_text,
+        "steps": steps_json.decode(),
+        "agents_involved": agents_json.decode(),
+        "timestamp": datetime.now()
+    })
     log_message("INFO", f"Task processed and saved: {task_text[:50]}...")
-    return jsonify(full_result), 200
+    return {
+        "task": task_text,
+        **result,
+        "steps": orjson.Fragment(steps_json),
+        "agents_involved": orjson.Fragment(agents_json)
+    }
+
+@app.route("/orchestrate", methods=["POST"])
+def orchestrate():
+    if LOG_LEVEL == "DEBUG":
+        log_message("DEBUG", "Orchestration request received")
+    task_text, max_chains = parse_orchestrate_request()
+
+    # Raw text goes to the LLM; HTML escaping belongs at render time
+    result = orchestrate_with_langchain(task_text, max_chains=max_chains)
+    return json_response(record_task_result(task_text, result))
+
+# Server-sent events: one "data:" event per agent reply as soon as it lands,
+# then a final event with "done": true and the same body /orchestrate returns
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.route("/orchestrate/stream", methods=["POST"])
+def orchestrate_stream():
+    if LOG_LEVEL == "DEBUG":
+        log_message("DEBUG", "Streaming orchestration request received")
+    task_text, max_chains = parse_orchestrate_request()
+
+    def generate():
+        for event in stream_orchestration(task_text, max_chains=max_chains):
+            if event.pop("done", False):
+                event = {"done": True, **record_task_result(task_text, event)}
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+# Probes get a pre-encoded body with only the timestamp filled in. The weak
+# ETag lets pollers that send If-None-Match get an empty 304 instead.
+HEALTHZ_TEMPLATE = b'{"status":"healthy","timestamp":"%s"}'
+HEALTHZ_HEADERS = {"Cache-Control": "no-store", "ETag": 'W/"healthy"'}
 
 @app.route("/healthz", methods=["GET"])
 def healthz():
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()}), 200
+    if request.if_none_match.contains_weak("healthy"):
+        return Response(status=304, headers=HEALTHZ_HEADERS)
+    body = HEALTHZ_TEMPLATE % iso_timestamp().encode()
+    return Response(body, status=200, mimetype="application/json", headers=HEALTHZ_HEADERS)
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    with _result_cache_lock:
+        stats = {**_result_cache_stats, "size": len(_result_cache)}
+    return json_response(stats)
 
 @app.errorhandler(400)
 def bad_request(e):
     log_message("ERROR", f"Bad request: {str(e)}")
-    return jsonify({"error": str(e)}), 400
+    return json_response({"error": str(e)}, 400)
+
+@app.errorhandler(413)
+def request_too_large(e):
+    log_message("ERROR", f"Request too large: {str(e)}")
+    return json_response({"error": str(e)}, 413)
 
 @app.errorhandler(500)
 def internal_error(e):
     log_message("ERROR", f"Internal error: {str(e)}")
-    return jsonify({"error": "Internal server error"}), 500
+    return json_response({"error": "Internal server error"}, 500)
+
+def create_db():
+    db.create_all()
+    # create_all skips indexes on tables that already exist
+    for index in Task.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+@app.cli.command("init-db")
+def init_db():
+    """Create the database tables and indexes."""
+    create_db()
 
 if __name__ == "__main__":
+    # Local development only; production runs under gunicorn (see README)
     with app.app_context():
-        db.create_all()
-    
-    @app.after_request
-    def after_request(response):
-        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline'"
-        return response
-    
+        create_db()
     app.run(host="0.0.0.0", port=8000, debug=True if LOG_LEVEL == "DEBUG" else False)
@@ -0,0 +1,206 @@
+import os
+import re
+import atexit
+import threading
+import time
+from collections import OrderedDict
+import httpx
+import orjson
+from dotenv import load_dotenv
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.exceptions import OutputParserException
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_xai import ChatXAI
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from prompts import AGENT_PROMPTS, SYSTEM_PROMPTS
+
+load_dotenv()
+
+# Environment vars with defaults
+LANGCHAIN_TEMP = float(os.getenv("LANGCHAIN_TEMP", "0.7"))
+# Replaying a cached answer is only safe when sampling is deterministic, so
+# the cache is off by default unless the temperature is 0
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048" if LANGCHAIN_TEMP == 0 else "0"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+class TTLLLMCache(BaseCache):
+    # Exact-match LLM cache keyed on (prompt, model settings). For agent calls
+    # the prompt is the agent persona plus its subtask, so a repeated
+    # (agent, subtask) pair skips the provider round-trip until it expires.
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt, llm_string):
+        key = (prompt, llm_string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            generations, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return generations
+
+    def update(self, prompt, llm_string, return_val):
+        key = (prompt, llm_string)
+        with self._lock:
+            self._entries[key] = (return_val, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._entries.clear()
+
+if LLM_CACHE_SIZE > 0:
+    set_llm_cache(TTLLLMCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL))
+
+# One pooled HTTP/2 client per process keeps connections to the provider warm,
+# so chain hops after the first skip the TCP and TLS handshakes. Idle
+# connections are held for a minute to bridge gaps between requests.
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=32, keepalive_expiry=60.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=3.0)
+http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+atexit.register(lambda: http_client.close())
+# Async calls keep the SDK's own client: an httpx.AsyncClient's connections
+# belong to the event loop that opened them and break under a new loop
+
+def create_llm():
+    xai_api_key = os.getenv("XAI_API_KEY")
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if xai_api_key:
+        return ChatXAI(model="grok-beta", xai_api_key=xai_api_key, temperature=LANGCHAIN_TEMP, http_client=http_client)
+    if google_api_key:
+        # google-genai owns its httpx client; pool it with the same settings
+        return ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=google_api_key, temperature=LANGCHAIN_TEMP,
+                                      client_args={"http2": True, "limits": HTTP_LIMITS})
+    # Defer error until first usage to allow importing without keys (for tests/health)
+    return None
+
+def create_embeddings():
+    # Only Gemini ships an embeddings model through the installed LangChain integrations
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if google_api_key:
+        return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=google_api_key)
+    return None
+
+# Built with the chains on first use rather than at import, so a preloaded
+# gunicorn master doesn't construct a client every worker throws away
+llm = None
+
+AGENT_NAMES = [agent_name for agent_name in AGENT_PROMPTS.keys() if agent_name != "Orchestrator"]
+
+# The static persona is sent as a literal system message ahead of the dynamic
+# input, so every call to the same agent shares a byte-identical prefix that
+# providers with prefix caching (xAI, Gemini) can reuse.
+def create_agent(llm, agent_name: str):
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=SYSTEM_PROMPTS[agent_name]),
+        ("human", "{task}")
+    ])
+    return prompt | llm
+
+# First "{" through last "}": the object inside markdown fences or prose
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+class OrjsonOutputParser(JsonOutputParser):
+    # Plain JSON, or a JSON object wrapped in fences or prose, is decoded by
+    # orjson; anything else (partial streams) goes through the stock parser
+    def parse_result(self, result, *, partial=False):
+        if not partial:
+            text = result[0].text
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                pass
+            match = JSON_OBJECT_RE.search(text)
+            if match is not None:
+                try:
+                    return orjson.loads(match.group(0))
+                except orjson.JSONDecodeError:
+                    pass
+        return super().parse_result(result, partial=partial)
+
+# The routing decision as a tool call: the provider returns parsed arguments
+# constrained to these agents instead of free text that may not be JSON
+ROUTER_SCHEMA = {
+    "title": "route",
+    "description": "Choose the next step for the task.",
+    "type": "object",
+    "properties": {
+        "agent": {"type": "string", "enum": AGENT_NAMES + ["FINISH"]},
+        "subtask": {"type": "string"},
+        "parallel": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"agent": {"type": "string", "enum": AGENT_NAMES}, "subtask": {"type": "string"}},
+                "required": ["agent", "subtask"],
+            },
+        },
+        "response": {"type": "string"},
+        "chain_next": {"type": "boolean"},
+        "next_agent": {"type": "string", "enum": AGENT_NAMES},
+    },
+    "required": ["agent"],
+}
+
+def require_route(router_output):
+    # A reply without the tool call falls through to the JSON-text chain
+    if not isinstance(router_output, dict):
+        raise ValueError("Orchestrator returned no routing call")
+    return router_output
+
+def create_orchestrator(llm):
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=SYSTEM_PROMPTS["Orchestrator"]),
+        ("human", "Task: {task}\n\nConversation History: {history}\n\nOutput JSON:")
+    ])
+    structured = prompt | llm.with_structured_output(ROUTER_SCHEMA, method="function_calling") | require_route
+    # Only bad routing output retries as JSON text; timeouts, rate limits and
+    # auth errors propagate instead of paying for a second call
+    return structured.with_fallbacks([prompt | llm | OrjsonOutputParser()], exceptions_to_handle=(OutputParserException, ValueError))
+
+def _build_agent_chains():
+    global llm
+    if llm is None:
+        llm = create_llm()
+    if llm is None:
+        raise RuntimeError("GOOGLE_API_KEY or XAI_API_KEY required")
+    chains = {agent_name: create_agent(llm, agent_name) for agent_name in AGENT_NAMES}
+    chains["Orchestrator"] = create_orchestrator(llm)
+    return chains
+
+# Chains hold no per-request state, so they are built once on first use and shared
+_AGENT_CHAINS = None
+_AGENT_CHAINS_LOCK = threading.Lock()
+
+def get_agent_chains():
+    global _AGENT_CHAINS
+    if _AGENT_CHAINS is None:
+        with _AGENT_CHAINS_LOCK:
+            if _AGENT_CHAINS is None:
+                _AGENT_CHAINS = _build_agent_chains()
+    return _AGENT_CHAINS
+
+# With gunicorn --preload this module is imported once in the master and its
+# pages are shared with the workers. Sockets and locks can't be shared across
+# a fork, so each child gets its own client and builds its LLM and chains
+# on first use.
+def _reset_after_fork():
+    global http_client, llm, _AGENT_CHAINS, _AGENT_CHAINS_LOCK
+    http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    llm = None
+    _AGENT_CHAINS = None
+    _AGENT_CHAINS_LOCK = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,183 +1,394 @@
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, Sequence
-import operator
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_xai import ChatXAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
-from dotenv import load_dotenv
-from langchain_core.output_parsers import JsonOutputParser
-
-load_dotenv()
-
-# Environment vars with defaults
-XAI_API_KEY = os.getenv("XAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-LANGCHAIN_TEMP = float(os.getenv("LANGCHAIN_TEMP", "0.7"))
-
-# LangChain setup
-if XAI_API_KEY:
-    llm = ChatXAI(model="grok-beta", xai_api_key=XAI_API_KEY, temperature=LANGCHAIN_TEMP)
-elif GOOGLE_API_KEY:
-    llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=LANGCHAIN_TEMP)
-else:
-    llm = None
-
-AGENT_PROMPTS = {
-    "CEO": (
-        "You are the CEO of a fast-paced, innovative technology company. Your primary responsibility is to provide high-level strategic direction and ensure all initiatives align with the company's vision and goals. "
-        "When presented with a task, you must: "
-        "1. Clarify the business goals, ensuring they are ambitious yet achievable. "
-        "2. Identify potential risks and outline strategic trade-offs. "
-        "3. Communicate your decisions concisely, providing clear rationale and expected outcomes. "
-        "4. Define measurable success metrics, set realistic timelines, and assign clear ownership to departments or individuals. "
-        "Your focus is on maximizing impact and maintaining alignment with the company's long-term vision. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "Manager": (
-        "You are a department manager responsible for translating strategic guidance into actionable work for your team. You are the bridge between the CEO's vision and the team's execution. "
-        "When a task is assigned to you, you must: "
-        "1. Break down the strategic goals into a detailed plan with clear milestones and deliverables. "
-        "2. Identify all necessary resources, including personnel, budget, and tools. "
-        "3. Proactively identify and mitigate dependencies and risks. "
-        "4. Assign specific tasks to team members, defining clear ownership and acceptance criteria. "
-        "5. Regularly communicate status updates to leadership and unblock your team to ensure smooth execution. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "Accountant": (
-        "You are the office accountant, responsible for the financial health and integrity of the company. You are meticulous, detail-oriented, and ensure all financial operations are transparent and compliant. "
-        "When you receive a task, you must: "
-        "1. Perform thorough cost analysis, budgeting, and return on investment (ROI) estimates. "
-        "2. Provide detailed line-item breakdowns for all financial projections, clearly stating your assumptions. "
-        "3. Conduct sensitivity analysis to understand potential financial variations. "
-        "4. Flag any potential policy or compliance issues and recommend solutions. "
-        "5. Produce clear, concise financial summaries and reports for stakeholders. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "HR": (
-        "You are the HR specialist, dedicated to building and supporting a world-class team. You are the guardian of the company culture and are responsible for all aspects of the employee lifecycle. "
-        "When tasked with a request, you must: "
-        "1. Develop comprehensive hiring plans and write structured, compelling job descriptions. "
-        "2. Design effective interview loops and onboarding processes for new hires. "
-        "3. Provide clear guidance on company policies and procedures. "
-        "4. Ensure all HR practices are legally compliant and adhere to the highest ethical standards. "
-        "Your goal is to attract, develop, and retain top talent. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "IT Support": (
-        "You are the IT support specialist, the go-to person for all technical issues in the company. You are a pragmatic problem-solver who ensures the company's technology infrastructure is reliable and efficient. "
-        "When a technical issue is reported, you must: "
-        "1. Diagnose the problem methodically and provide step-by-step troubleshooting instructions. "
-        "2. Formulate clear hypotheses about the root cause and implement effective solutions. "
-        "3. Recommend and implement preventive measures to avoid future issues. "
-        "4. Offer recommendations for new tools and technologies that can improve productivity. "
-        "5. Document your solutions in a clear, reproducible manner. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "Sales Rep": (
-        "You are a sales representative, the voice of the company to our customers. You are a skilled communicator and a trusted advisor, focused on building strong customer relationships and driving revenue growth. "
-        "When you are working on a sales-related task, you must: "
-        "1. Craft compelling, customer-facing messaging that clearly articulates our value proposition. "
-        "2. Develop insightful discovery questions to understand customer needs and pain points. "
-        "3. Tailor sales proposals to address specific customer challenges and quantify the benefits of our solution. "
-        "4. Outline clear next steps in the sales process to accelerate deal progress and close deals. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "Secretary": (
-        "You are the office secretary, the master of organization and communication. You ensure the smooth and efficient operation of the office by managing information and coordinating activities. "
-        "When you are given a task, you must: "
-        "1. Organize and manage information with exceptional clarity and efficiency. "
-        "2. Draft concise, professional emails and memos. "
-        "3. Schedule meetings, prepare agendas, and summarize action items. "
-        "4. Optimize all communications for clarity, tone, and formatting to ensure they are easily consumed by busy professionals. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to a complete their task."
-    ),
-    "Architect": (
-        "You are the Architect, responsible for designing robust, scalable, and elegant systems and processes. You are a visionary thinker who translates business requirements into technical solutions. "
-        "When you are tasked with a design, you must: "
-        "1. Create clear and detailed system designs, using diagrams-in-words, defining interfaces, and mapping data flows. "
-        "2. Document all design decisions, including trade-offs and non-functional requirements. "
-        "3. Develop a phased rollout plan to ensure a smooth and successful implementation. "
-        "Your designs should be forward-thinking and built to last. "
-        "Your response will be passed to the next agent in the chain, so it must be clear, concise, and contain all necessary information for them to complete their task."
-    ),
-    "Orchestrator": (
-        "You are the Orchestration agent. Your goal is to break down complex tasks into a series of subtasks, each handled by a specialized agent. "
-        "Analyze the user's request and the conversation history, then determine the next agent to act. "
-        "If the task is complete, respond with \"FINISH\". "
-        "Otherwise, specify the next agent and the subtask for them. "
-        "For example, a request to 'develop and market a new feature' might first go to the Architect, then the Manager, and finally the Sales Rep. "
-        "Output strict JSON with keys: {agent, subtask}."
-    )
-}
+import operator
+import asyncio
+import re
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.runnables import RunnableLambda
+from chains import AGENT_NAMES, LANGCHAIN_TEMP, get_agent_chains
+from routing import keyword_route
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
+    agents: Annotated[Sequence[str], operator.add]
+    parallel: Sequence[dict]
+    # Set by a parallel hop so a FINISH right after it returns every reply,
+    # not just the last branch's; any other hop clears it
+    response: str
+    # Most agent replies in one run; the chain ends on the reply that reaches it
+    max_chains: int
+    # The first node run and the keyword scores that chose it, and whether the
+    # Orchestrator made a routing decision at any point
+    first_hop: str
+    keyword_scores: dict
+    orchestrated: bool
     next: str
 
-def create_agent(llm, agent_name: str):
-    prompt = ChatPromptTemplate.from_template(AGENT_PROMPTS[agent_name] + "\n\nUser Task: {task}\n\nAgent Response:")
-    return prompt | llm
+NEXT_RE = re.compile(r'<NEXT>\s*([^<]+?)\s*</NEXT>')
 
-def create_orchestrator(llm):
-    prompt = ChatPromptTemplate.from_template(AGENT_PROMPTS["Orchestrator"] + "\n\nConversation History: {history}\n\nTask: {task}\n\nOutput JSON:")
-    return prompt | llm | JsonOutputParser()
+def split_handoff(response):
+    # Returns the response without its <NEXT> tag and the node to run next
+    content = response.content
+    if not isinstance(content, str):
+        return response, "Orchestrator"
+    match = NEXT_RE.search(content)
+    if match is None:
+        return response, "Orchestrator"
+    response = response.model_copy(update={"content": NEXT_RE.sub("", content).strip()})
+    handoff = match.group(1)
+    if handoff.upper() in ("DONE", "FINISH"):
+        return response, "FINISH"
+    if handoff in AGENT_NAMES:
+        return response, handoff
+    return response, "Orchestrator"
 
-agent_nodes = {}
-for agent_name in AGENT_PROMPTS.keys():
-    if agent_name != "Orchestrator":
-        agent_nodes[agent_name] = create_agent(llm, agent_name)
+def chain_exhausted(state: AgentState):
+    return len(state['agents']) >= state['max_chains']
 
-orchestrator_chain = create_orchestrator(llm)
+def cap_chain(state: AgentState, update):
+    # Handoffs bypass the Orchestrator, so the reply that uses up max_chains
+    # ends the run here rather than passing the chain on. A parallel plan
+    # only keeps as many assignments as the budget has left.
+    remaining = state['max_chains'] - len(state['agents'])
+    if update["next"] == "ParallelAgents":
+        if remaining <= 0:
+            return {"next": "FINISH"}
+        update["parallel"] = update["parallel"][:remaining]
+        return update
+    if update.get("agents") and update["next"] != "FINISH" and len(state['agents']) + len(update["agents"]) >= state['max_chains']:
+        update["next"] = "FINISH"
+    return update
 
-def agent_node_wrapper(state: AgentState):
+def agent_task(state: AgentState):
+    # An Orchestrator subtask is self-contained; a handoff passes on the
+    # previous agent's reply together with the user's original request
     last_message = state['messages'][-1]
+    if isinstance(last_message, HumanMessage):
+        return last_message.content
+    return f"Original request: {state['messages'][0].content}\n\n{state['agents'][-1]} replied: {last_message.content}"
+
+def agent_update(state: AgentState, agent_name, response):
+    response, next_node = split_handoff(response)
+    if next_node == agent_name:
+        next_node = "Orchestrator"
+    return cap_chain(state, {"messages": [response], "agents": [agent_name], "response": "", "next": next_node})
+
+def agent_node_wrapper(state: AgentState):
     agent_name = state['next']
     
-    response = agent_nodes[agent_name].invoke({"task": last_message.content})
+    response = get_agent_chains()[agent_name].invoke({"task": agent_task(state)})
     
-    return {"messages": [response]}
+    return agent_update(state, agent_name, response)
 
-def orchestrator_node_wrapper(state: AgentState):
-    task = state['messages'][0].content
-    history = state['messages'][1:]
+async def agent_node_wrapper_async(state: AgentState):
+    agent_name = state['next']
+    
+    response = await get_agent_chains()[agent_name].ainvoke({"task": agent_task(state)})
+    
+    return agent_update(state, agent_name, response)
+
+def parallel_update(assignments, responses):
+    messages = []
+    replies = []
+    for assignment, response in zip(assignments, responses):
+        response, _ = split_handoff(response)
+        messages.extend([HumanMessage(content=assignment["subtask"]), response])
+        replies.append(f"{assignment['agent']}: {response.content}")
+    return {
+        "messages": messages,
+        "agents": [assignment["agent"] for assignment in assignments],
+        "response": "\n\n".join(replies)
+    }
+
+# Independent assignments only wait on the slowest agent, not the sum of all.
+# At most this many run at once so a wide plan can't trip provider rate limits;
+# values below 1 run the assignments one at a time.
+PARALLEL_AGENT_LIMIT = max(1, int(os.getenv("PARALLEL_AGENT_LIMIT", "4")))
+
+def parallel_agents_node(state: AgentState):
+    assignments = state['parallel']
+    chains = get_agent_chains()
+    with ThreadPoolExecutor(max_workers=min(len(assignments), PARALLEL_AGENT_LIMIT)) as executor:
+        responses = list(executor.map(
+            lambda assignment: chains[assignment["agent"]].invoke({"task": assignment["subtask"]}),
+            assignments
+        ))
     
-    router_output = orchestrator_chain.invoke({"task": task, "history": history})
+    return parallel_update(assignments, responses)
+
+async def parallel_agents_node_async(state: AgentState):
+    assignments = state['parallel']
+    chains = get_agent_chains()
+    semaphore = asyncio.Semaphore(PARALLEL_AGENT_LIMIT)
+
+    async def run(assignment):
+        async with semaphore:
+            return await chains[assignment["agent"]].ainvoke({"task": assignment["subtask"]})
+
+    responses = await asyncio.gather(*(run(assignment) for assignment in assignments))
+    
+    return parallel_update(assignments, responses)
+
+# Routing needs the gist of earlier replies, not their full text, so every
+# message but the latest is clipped to this many characters. 0 disables.
+ORCHESTRATOR_HISTORY_CHARS = int(os.getenv("ORCHESTRATOR_HISTORY_CHARS", "600"))
+
+def clip_content(content):
+    if ORCHESTRATOR_HISTORY_CHARS <= 0 or not isinstance(content, str) or len(content) <= ORCHESTRATOR_HISTORY_CHARS:
+        return content
+    return content[:ORCHESTRATOR_HISTORY_CHARS].rstrip() + " [...]"
+
+def format_history(messages, clip=False):
+    # Plain "Subtask:/Response:" text rather than message reprs, which carry
+    # per-run ids. Each hop's prompt then starts with the previous hop's
+    # prompt (up to the reply that just got clipped), so the provider's
+    # prefix cache keeps hitting as the chain grows.
+    lines = []
+    for position, message in enumerate(messages, start=1):
+        label = "Subtask" if message.type == "human" else "Response"
+        content = clip_content(message.content) if clip and position < len(messages) else message.content
+        lines.append(f"{label}: {content}")
+    return "\n\n".join(lines)
+
+# The Orchestrator only sees the most recent messages, so a long chain's
+# routing prompt stops growing once it passes this many. 0 keeps them all.
+ORCHESTRATOR_HISTORY_MESSAGES = int(os.getenv("ORCHESTRATOR_HISTORY_MESSAGES", "12"))
+
+def trim_history(messages):
+    if ORCHESTRATOR_HISTORY_MESSAGES <= 0 or len(messages) <= ORCHESTRATOR_HISTORY_MESSAGES:
+        return format_history(messages, clip=True)
+    omitted = len(messages) - ORCHESTRATOR_HISTORY_MESSAGES
+    return f"({omitted} earlier messages omitted)\n\n" + format_history(messages[omitted:], clip=True)
+
+def orchestrator_input(state: AgentState):
+    return {"task": state['messages'][0].content, "history": trim_history(state['messages'][1:])}
+
+def orchestrator_update(router_output, task):
+    if router_output.get("parallel"):
+        return {"next": "ParallelAgents", "parallel": router_output["parallel"], "response": ""}
     
     if "FINISH" in router_output.get("agent", "").upper():
         return {"next": "FINISH"}
     
+    # A route without a subtask hands the agent the whole task
+    subtask = router_output.get("subtask") or task
+
+    # Routing and the agent's answer came back in one call; skip the agent hop
+    if router_output.get("response"):
+        next_node = "FINISH"
+        if router_output.get("chain_next") and router_output.get("next_agent") in AGENT_NAMES:
+            next_node = router_output["next_agent"]
+        return {
+            "next": next_node,
+            "messages": [HumanMessage(content=subtask), AIMessage(content=router_output["response"])],
+            "agents": [router_output["agent"]],
+            "response": ""
+        }
+    
     return {
         "next": router_output["agent"],
-        "messages": [HumanMessage(content=router_output["subtask"])]
+        "messages": [HumanMessage(content=subtask)],
+        "response": ""
     }
 
-workflow = StateGraph(AgentState)
+# A routing decision depends only on the task and the history so far, so an
+# identical routing input (a recurring task, a retry, a repeated chain with
+# cached agent replies) reuses the earlier decision instead of asking the
+# Orchestrator again. Like the LLM cache it is off unless sampling is
+# deterministic; 0 disables it.
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "4096" if LANGCHAIN_TEMP == 0 else "0"))
+ROUTER_CACHE_TTL = float(os.getenv("ROUTER_CACHE_TTL", "3600"))
+_router_cache = OrderedDict()
+_router_cache_lock = threading.Lock()
+
+def router_cache_key(router_input):
+    if ROUTER_CACHE_SIZE <= 0:
+        return None
+    key = hashlib.blake2b(digest_size=16)
+    key.update(" ".join(router_input["task"].lower().split()).encode())
+    key.update(b"\0")
+    key.update(router_input["history"].encode())
+    return key.digest()
+
+def get_cached_route(key):
+    if key is None:
+        return None
+    with _router_cache_lock:
+        entry = _router_cache.get(key)
+        if entry is None:
+            return None
+        router_output, expires = entry
+        if time.monotonic() >= expires:
+            del _router_cache[key]
+            return None
+        _router_cache.move_to_end(key)
+    return copy.deepcopy(router_output)
+
+def store_cached_route(key, router_output):
+    if key is None:
+        return
+    with _router_cache_lock:
+        _router_cache[key] = (copy.deepcopy(router_output), time.monotonic() + ROUTER_CACHE_TTL)
+        _router_cache.move_to_end(key)
+        while len(_router_cache) > ROUTER_CACHE_SIZE:
+            _router_cache.popitem(last=False)
+
+def is_cacheable_route(router_output, update):
+    # Only decisions the graph can follow are worth replaying. A decision that
+    # carries the agent's answer is an LLM reply, not just a route, and is
+    # never replayed.
+    if router_output.get("response"):
+        return False
+    if update["next"] == "ParallelAgents":
+        return all(assignment.get("agent") in AGENT_NAMES and assignment.get("subtask") for assignment in update["parallel"])
+    return update["next"] == "FINISH" or update["next"] in AGENT_NAMES
 
-workflow.add_node("Orchestrator", orchestrator_node_wrapper)
-for agent_name in agent_nodes.keys():
-    workflow.add_node(agent_name, agent_node_wrapper)
+def route_update(key, router_output, task):
+    # A malformed decision raises here, before it can reach the cache, so a
+    # retry asks the Orchestrator again
+    update = orchestrator_update(router_output, task)
+    if is_cacheable_route(router_output, update):
+        store_cached_route(key, router_output)
+    return update
 
-workflow.set_entry_point("Orchestrator")
+def orchestrator_node_wrapper(state: AgentState):
+    if chain_exhausted(state):
+        return {"next": "FINISH"}
+    router_input = orchestrator_input(state)
+    key = router_cache_key(router_input)
+    router_output = get_cached_route(key)
+    if router_output is not None:
+        update = orchestrator_update(router_output, router_input["task"])
+    else:
+        update = route_update(key, get_agent_chains()["Orchestrator"].invoke(router_input), router_input["task"])
+    return cap_chain(state, {**update, "orchestrated": True})
+
+async def orchestrator_node_wrapper_async(state: AgentState):
+    if chain_exhausted(state):
+        return {"next": "FINISH"}
+    router_input = orchestrator_input(state)
+    key = router_cache_key(router_input)
+    router_output = get_cached_route(key)
+    if router_output is not None:
+        update = orchestrator_update(router_output, router_input["task"])
+    else:
+        update = route_update(key, await get_agent_chains()["Orchestrator"].ainvoke(router_input), router_input["task"])
+    return cap_chain(state, {**update, "orchestrated": True})
+
+workflow = StateGraph(AgentState)
+
+# Each node has a sync body for invoke() and an async body for ainvoke()
+workflow.add_node("Orchestrator", RunnableLambda(orchestrator_node_wrapper, afunc=orchestrator_node_wrapper_async))
+for agent_name in AGENT_NAMES:
+    workflow.add_node(agent_name, RunnableLambda(agent_node_wrapper, afunc=agent_node_wrapper_async))
+workflow.add_node("ParallelAgents", RunnableLambda(parallel_agents_node, afunc=parallel_agents_node_async))
 
 def router(state: AgentState):
-    if state['next'] == "FINISH":
-        return END
+    # "FINISH" is mapped to END by the path maps below
     return state['next']
 
-workflow.add_conditional_edges(
-    "Orchestrator",
-    router,
-    {agent_name: agent_name for agent_name in agent_nodes.keys()} | {"FINISH": END}
-)
+# Path maps are built once and shared by every edge that uses them
+AGENT_PATHS = {agent_name: agent_name for agent_name in AGENT_NAMES}
+ENTRY_PATHS = AGENT_PATHS | {"Orchestrator": "Orchestrator"}
+ORCHESTRATOR_PATHS = AGENT_PATHS | {"ParallelAgents": "ParallelAgents", "FINISH": END}
+HANDOFF_PATHS = ENTRY_PATHS | {"FINISH": END}
+
+# initial_state picks the first node: a keyword-routed agent or the Orchestrator
+workflow.set_conditional_entry_point(router, ENTRY_PATHS)
+
+workflow.add_conditional_edges("Orchestrator", router, ORCHESTRATOR_PATHS)
 
-for agent_name in agent_nodes.keys():
-    workflow.add_edge(agent_name, "Orchestrator")
+# An agent that names its successor hands off directly; otherwise the
+# Orchestrator decides
+for agent_name in AGENT_NAMES:
+    workflow.add_conditional_edges(agent_name, router, HANDOFF_PATHS)
+workflow.add_edge("ParallelAgents", "Orchestrator")
 
 app_graph = workflow.compile()
 
-def run_graph(task: str):
-    initial_state = {"messages": [HumanMessage(content=task)], "next": "Orchestrator"}
-    final_state = app_graph.invoke(initial_state)
-    return final_state['messages'][-1].content
+def warm_up():
+    # Builds the chains and renders every prompt once so a worker's first
+    # request doesn't pay for it. No LLM calls are made.
+    try:
+        chains = get_agent_chains()
+    except RuntimeError:
+        return
+    for chain in chains.values():
+        chain.first.invoke({"task": "warm-up", "history": ""})
+
+def initial_state(task: str, max_chains=5):
+    # Tasks with clear keyword evidence go straight to that agent with the
+    # whole task as its subtask, saving the Orchestrator's routing round-trip
+    agent_name, scores = keyword_route(task)
+    state = {
+        "agents": [], "parallel": [], "response": "", "max_chains": max_chains,
+        "keyword_scores": dict(scores.most_common()), "orchestrated": False
+    }
+    if agent_name is not None:
+        return {**state, "messages": [HumanMessage(content=task), HumanMessage(content=task)], "first_hop": agent_name, "next": agent_name}
+    return {**state, "messages": [HumanMessage(content=task)], "first_hop": "Orchestrator", "next": "Orchestrator"}
+
+def graph_result(final_state):
+    # agents_involved lists the Orchestrator only when it actually routed
+    orchestrator = ["Orchestrator"] if final_state['orchestrated'] else []
+    return {
+        "response": final_state['response'] or final_state['messages'][-1].content,
+        "agents_involved": orchestrator + list(final_state['agents']),
+        "first_hop": final_state['first_hop'],
+        "keyword_scores": final_state['keyword_scores']
+    }
+
+def run_graph(task: str, max_chains=5):
+    final_state = app_graph.invoke(initial_state(task, max_chains))
+    return graph_result(final_state)
+
+def split_streamed_text(text):
+    # Returns (text safe to send, text held back because it is or may become
+    # the trailing <NEXT> tag)
+    tag_start = text.find("<NEXT>")
+    if tag_start != -1:
+        return text[:tag_start], text[tag_start:]
+    last_open = text.rfind("<")
+    if last_open != -1 and "<NEXT>".startswith(text[last_open:]):
+        return text[:last_open], text[last_open:]
+    return text, ""
+
+def stream_graph(task: str, max_chains=5):
+    # Yields {"agent", "delta"} for each token an agent generates and
+    # {"agent", "response"} once its reply lands, then returns the same
+    # result as run_graph. Orchestrator tokens are routing JSON and are not sent.
+    final_state = None
+    held = {}
+    for mode, chunk in app_graph.stream(initial_state(task, max_chains), stream_mode=["messages", "updates", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            # Only streamed model tokens; finished replies arrive as updates
+            if node in AGENT_NAMES and isinstance(message, AIMessageChunk) and isinstance(message.content, str) and message.content:
+                delta, held[node] = split_streamed_text(held.get(node, "") + message.content)
+                if delta:
+                    yield {"agent": node, "delta": delta}
+            continue
+        if mode == "values":
+            final_state = chunk
+            continue
+        for node, node_update in chunk.items():
+            held.pop(node, None)
+            if not node_update or not node_update.get("agents"):
+                continue
+            replies = [message for message in node_update["messages"] if not isinstance(message, HumanMessage)]
+            for agent_name, reply in zip(node_update["agents"], replies):
+                yield {"agent": agent_name, "response": reply.content}
+    return graph_result(final_state)
+
+async def arun_graph(task: str, max_chains=5):
+    # Same graph, but LLM calls are awaited and parallel fan-outs use asyncio.gather
+    final_state = await app_graph.ainvoke(initial_state(task, max_chains))
+    return graph_result(final_state)
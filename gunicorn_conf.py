@@ -0,0 +1,29 @@
+import os
+import multiprocessing
+
+# Requests spend almost all their time waiting on LLM round-trips, so each
+# worker runs gevent greenlets and a handful of processes can overlap many calls.
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gevent"
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+# Outlast the usual 60 s load balancer idle timeout so the balancer, not
+# gunicorn, closes idle client connections
+keepalive = 75
+# A routed task can chain several LLM calls
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# Import the app (LangChain, LangGraph, prompts, compiled graph) once in the
+# master and share the pages with every worker. The app is then loaded before
+# any worker has patched the stdlib, so patch here; chains.py and app.py
+# rebuild their client, chains and log thread in each forked worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+if preload_app:
+    from gevent import monkey
+    monkey.patch_all()
+
+def post_worker_init(worker):
+    # Build chains and render prompts before the worker takes traffic
+    from graph_orchestrator import warm_up
+    warm_up()
@@ -0,0 +1,14 @@
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(500), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    steps = db.Column(db.Text, nullable=False)
+    agents_involved = db.Column(db.String(200), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (db.Index('ix_task_timestamp', 'timestamp'),)
@@ -0,0 +1,53 @@
+import os
+import re
+from collections import Counter
+
+# A keyword route skips the Orchestrator's routing call, so it needs at least
+# this many hits and a clear lead over the runner-up. 0 disables it.
+KEYWORD_ROUTE_MIN_SCORE = int(os.getenv("KEYWORD_ROUTE_MIN_SCORE", "2"))
+KEYWORD_ROUTE_MIN_RATIO = 2.0
+
+# Keywords that point clearly at one department; matched as whole words
+ROUTING_KEYWORDS = {
+    "CEO": ("strategy", "vision", "acquisition", "merger", "board", "investor"),
+    "Manager": ("schedule", "deadline", "project", "milestone", "sprint", "workload"),
+    "Accountant": ("budget", "invoice", "tax", "expense", "payroll", "audit", "forecast"),
+    "HR": ("hire", "hiring", "recruit", "onboarding", "benefit", "employee", "vacation", "harassment"),
+    "IT Support": ("laptop", "network", "printer", "vpn", "software", "server", "wifi", "outage"),
+    "Sales Rep": ("sales", "lead", "client", "quote", "pitch", "deal", "prospect"),
+    "Secretary": ("meeting", "calendar", "appointment", "memo", "minutes", "email"),
+    "Architect": ("system design", "architecture", "architecture diagram", "scalability", "integration", "data model", "data flow"),
+}
+
+# One alternation over every keyword scans the task in a single pass instead
+# of one substring search per keyword; longer keywords are tried first
+KEYWORD_AGENTS = {keyword: agent for agent, keywords in ROUTING_KEYWORDS.items() for keyword in keywords}
+KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(keyword) for keyword in sorted(KEYWORD_AGENTS, key=len, reverse=True)) + r")(?:s|es)?\b",
+    re.IGNORECASE,
+)
+
+def score_agents(task):
+    return Counter(KEYWORD_AGENTS[match.group(1).lower()] for match in KEYWORD_RE.finditer(task))
+
+def route_task(task):
+    # Best keyword match, or None when no keyword appears
+    scores = score_agents(task)
+    if not scores:
+        return None
+    return scores.most_common(1)[0][0]
+
+def keyword_route(task):
+    # Returns (agent, scores): the agent only when the keyword evidence is
+    # unambiguous, and the scores behind the decision
+    if KEYWORD_ROUTE_MIN_SCORE <= 0:
+        return None, Counter()
+    scores = score_agents(task)
+    ranked = scores.most_common(2)
+    if not ranked:
+        return None, scores
+    agent, top_score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    if top_score >= KEYWORD_ROUTE_MIN_SCORE and top_score >= KEYWORD_ROUTE_MIN_RATIO * runner_up:
+        return agent, scores
+    return None, scores
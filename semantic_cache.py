@@ -0,0 +1,38 @@
+import math
+import operator
+import threading
+import time
+from collections import deque
+
+class SemanticCache:
+    # Maps task embeddings to orchestration results. A lookup returns the
+    # stored result whose task is most similar to the new one, provided the
+    # cosine similarity clears the threshold, the entry hasn't expired and it
+    # was produced under the same max_chains. Vectors are normalized on the
+    # way in, so similarity is a plain dot product.
+    def __init__(self, embeddings, threshold=0.92, maxsize=256, ttl=60.0):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    def embed(self, task):
+        vector = self.embeddings.embed_query(task)
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def lookup(self, vector, max_chains):
+        now = time.monotonic()
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[3] > now and entry[2] == max_chains]
+        best_score, best_result = self.threshold, None
+        for stored_vector, result, _, _ in entries:
+            score = sum(map(operator.mul, vector, stored_vector))
+            if score >= best_score:
+                best_score, best_result = score, result
+        return best_result
+
+    def store(self, vector, result, max_chains):
+        with self._lock:
+            self._entries.append((vector, result, max_chains, time.monotonic() + self.ttl))
@@ -1,19 +1,31 @@
 import unittest
 import sys
+import queue
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, orchestrate_with_langchain, AGENT_PROMPTS
+from app import app, orchestrate_with_langchain, AGENT_PROMPTS, _result_cache, _result_cache_stats
+from graph_orchestrator import _router_cache
+import routing
 import unittest.mock
 
 class TestOfficeCube(unittest.TestCase):
-    def setUp(self):
-        self.client = app.test_client()
-        self.app_context = app.app_context()
-        self.app_context.push()
+    @classmethod
+    def setUpClass(cls):
+        # One client and app context for the whole suite; tests share no
+        # request state, only the caches reset below
+        cls.client = app.test_client()
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app_context.pop()
 
-    def tearDown(self):
-        self.app_context.pop()
+    def setUp(self):
+        _result_cache.clear()
+        _result_cache_stats.update(hits=0, misses=0)
+        _router_cache.clear()
 
     def test_healthz(self):
         """Smoke test: Health endpoint."""
@@ -21,31 +33,149 @@ class TestOfficeCube(unittest.TestCase):
         self.assertEqual(rv.status_code, 200)
         data = rv.get_json()
         self.assertEqual(data['status'], 'healthy')
+        self.assertIn('timestamp', data)
+        self.assertEqual(rv.headers['Cache-Control'], 'no-store')
 
-    @unittest.mock.patch('app.db.session.commit')
-    @unittest.mock.patch('app.db.session.add')
-    @unittest.mock.patch('app._build_agent_chains')
-    def test_orchestrate_langchain(self, mock_build_chains, mock_db_add, mock_db_commit):
+        rv = self.client.get('/healthz', headers={'If-None-Match': rv.headers['ETag']})
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.data, b'')
+
+    def test_cors_preflight(self):
+        """Unit: Preflight is answered directly with the static CORS headers."""
+        rv = self.client.options('/orchestrate')
+        self.assertEqual(rv.status_code, 204)
+        self.assertEqual(rv.headers['Access-Control-Allow-Origin'], '*')
+        self.assertIn('POST', rv.headers['Access-Control-Allow-Methods'])
+        self.assertEqual(rv.headers['Vary'], 'Origin')
+
+    @unittest.mock.patch('app.enqueue_task_record')
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_langchain(self, mock_get_chains, mock_enqueue):
         """Integration: LangChain orchestration with mocks."""
         mock_chains = {
-            "Orchestration": unittest.mock.MagicMock(),
+            "Orchestrator": unittest.mock.MagicMock(),
             "CEO": unittest.mock.MagicMock()
         }
-        mock_chains["Orchestration"].invoke.return_value = {"agent": "CEO", "subtask": "Test", "chain_next": False}
+        mock_chains["Orchestrator"].invoke.side_effect = [{"agent": "CEO", "subtask": "Test"}, {"agent": "FINISH"}]
         mock_chains["CEO"].invoke.return_value.content = "Mock response"
-        mock_build_chains.return_value = mock_chains
+        mock_get_chains.return_value = mock_chains
 
         rv = self.client.post('/orchestrate', json={'task': 'Strategy plan'})
         self.assertEqual(rv.status_code, 200)
         data = rv.get_json()
         self.assertIn('response', data)
         self.assertEqual(data['response'], 'Mock response')
+        mock_enqueue.assert_called_once()
+        self.assertEqual(mock_enqueue.call_args[0][0]['task'], 'Strategy plan')
+        self.assertEqual(data['agents_involved'], ["Orchestrator", "CEO"])
+        self.assertEqual(mock_enqueue.call_args[0][0]['agents_involved'], '["Orchestrator","CEO"]')
+
+    @unittest.mock.patch('app.write_task_rows')
+    @unittest.mock.patch('app._task_writer', unittest.mock.MagicMock())
+    @unittest.mock.patch('app.TASK_WRITE_QUEUE', queue.Queue(maxsize=1))
+    def test_enqueue_task_record_overflow(self, mock_write_rows):
+        """Unit: A full write queue falls back to an inline write instead of dropping the row."""
+        from app import enqueue_task_record
+        enqueue_task_record({"task": "first"})
+        mock_write_rows.assert_not_called()
+        enqueue_task_record({"task": "second"})
+        mock_write_rows.assert_called_once_with([{"task": "second"}])
+
+    @unittest.mock.patch('app.write_task_rows')
+    @unittest.mock.patch('app.TASK_WRITE_QUEUE', queue.Queue())
+    def test_stop_task_writer_writes_pending_rows(self, mock_write_rows):
+        """Unit: Stopping the writer at exit lets it finish every queued row before the thread ends."""
+        import threading
+        import app as app_module
+        writer = threading.Thread(target=app_module._task_writer_loop, daemon=True)
+        with unittest.mock.patch('app._task_writer', writer):
+            for i in range(3):
+                app_module.TASK_WRITE_QUEUE.put({"task": f"Task {i}"})
+            writer.start()
+            app_module.stop_task_writer()
+        self.assertFalse(writer.is_alive())
+        written = [row for call in mock_write_rows.call_args_list for row in call[0][0]]
+        self.assertEqual(written, [{"task": f"Task {i}"} for i in range(3)])
+
+    @unittest.mock.patch('app.datetime')
+    @unittest.mock.patch('app.time.time')
+    def test_iso_timestamp_reuses_cached_prefix(self, mock_time, mock_datetime):
+        """Unit: Timestamps format the date/time once per second and reuse the string within a millisecond."""
+        from app import iso_timestamp
+        mock_datetime.fromtimestamp.return_value.isoformat.return_value = "2024-01-01T00:00:00"
+        mock_time.return_value = 1000.25
+        self.assertEqual(iso_timestamp(), "2024-01-01T00:00:00.250")
+        mock_time.return_value = 1000.2504
+        self.assertEqual(iso_timestamp(), "2024-01-01T00:00:00.250")
+        mock_time.return_value = 1000.5
+        self.assertEqual(iso_timestamp(), "2024-01-01T00:00:00.500")
+        mock_datetime.fromtimestamp.assert_called_once_with(1000)
+
+    @unittest.mock.patch('app.db.session.commit')
+    @unittest.mock.patch('app.db.session.execute')
+    def test_write_task_rows_batches(self, mock_db_execute, mock_db_commit):
+        """Unit: Queued task rows are inserted in a single statement and commit."""
+        from app import write_task_rows
+        rows = [{"task": f"Task {i}", "response": "ok", "steps": "[]", "agents_involved": "[]", "timestamp": None} for i in range(3)]
+        write_task_rows(rows)
+        mock_db_execute.assert_called_once()
+        self.assertEqual(mock_db_execute.call_args[0][1], rows)
+        mock_db_commit.assert_called_once()
+
+    @unittest.mock.patch('app.create_db')
+    def test_init_db_command(self, mock_create_db):
+        """Unit: The init-db command creates the tables through create_db."""
+        rv = app.test_cli_runner().invoke(args=["init-db"])
+        self.assertEqual(rv.exit_code, 0)
+        mock_create_db.assert_called_once_with()
+
+    @unittest.mock.patch('app.enqueue_task_record')
+    @unittest.mock.patch('app.run_graph')
+    def test_orchestrate_passes_raw_task(self, mock_run_graph, mock_enqueue):
+        """Unit: Task text reaches the orchestrator without HTML escaping."""
+        mock_run_graph.return_value = {"response": "ok", "agents_involved": [], "first_hop": "Orchestrator", "keyword_scores": {}}
+        rv = self.client.post('/orchestrate', json={'task': 'R&D <plan> for "Q3"'})
+        self.assertEqual(rv.status_code, 200)
+        mock_run_graph.assert_called_once_with('R&D <plan> for "Q3"', 5)
+
+    def test_handoff_instruction_only_in_system_prompts(self):
+        """Unit: The handoff instruction is composed into agent system prompts without changing AGENT_PROMPTS."""
+        from prompts import HANDOFF_INSTRUCTION, SYSTEM_PROMPTS
+        self.assertNotIn(HANDOFF_INSTRUCTION, AGENT_PROMPTS["CEO"])
+        self.assertTrue(SYSTEM_PROMPTS["CEO"].endswith(AGENT_PROMPTS["CEO"] + HANDOFF_INSTRUCTION))
+        self.assertNotIn(HANDOFF_INSTRUCTION, SYSTEM_PROMPTS["Orchestrator"])
+
+    def test_orchestrate_non_string_task(self):
+        """Unit: A task that isn't a string is rejected with a type error, not a length error."""
+        for task in (None, 42, ['Plan'], {'text': 'Plan'}):
+            rv = self.client.post('/orchestrate', json={'task': task})
+            self.assertEqual(rv.status_code, 400)
+            self.assertIn("Task must be a string", rv.get_json()['error'])
 
     def test_orchestrate_invalid_length(self):
         """Unit: Invalid input rejected."""
         long_task = 'a' * 501
         rv = self.client.post('/orchestrate', json={'task': long_task})
         self.assertEqual(rv.status_code, 400)
+        for task in (None, 42, ['Plan'], '   ', 'Plan\x00', 'Plan\x1b[2J'):
+            rv = self.client.post('/orchestrate', json={'task': task})
+            self.assertEqual(rv.status_code, 400)
+
+    def test_orchestrate_oversized_body(self):
+        """Unit: Oversized bodies are rejected before parsing."""
+        rv = self.client.post('/orchestrate', json={'task': 'a' * 5000})
+        self.assertEqual(rv.status_code, 413)
+
+    def test_orchestrate_invalid_max_chains(self):
+        """Unit: max_chains must be a plain integer in range."""
+        for max_chains in (0, 11, True, "5"):
+            rv = self.client.post('/orchestrate', json={'task': 'Plan', 'max_chains': max_chains})
+            self.assertEqual(rv.status_code, 400)
+
+    def test_orchestrate_invalid_json(self):
+        """Unit: Malformed JSON body is rejected."""
+        rv = self.client.post('/orchestrate', data='{"task": ', content_type='application/json')
+        self.assertEqual(rv.status_code, 400)
 
     def test_agent_prompts(self):
         """Unit: Verify all expanded prompts exist and are detailed."""
@@ -54,66 +184,600 @@ class TestOfficeCube(unittest.TestCase):
             self.assertGreater(len(prompt), 100)  # Ensures expansion
             self.assertIn("You are", prompt)  # Basic structure check
 
-    @unittest.mock.patch('app._build_agent_chains')
-    def test_orchestrate_with_langchain_success(self, mock_build_chains):
+    @unittest.mock.patch('chains._AGENT_CHAINS', None)
+    @unittest.mock.patch('chains.llm', unittest.mock.MagicMock())
+    def test_agent_chains_built_once(self):
+        """Unit: Agent chains are built on first use and reused afterwards."""
+        import chains
+        with unittest.mock.patch('chains._build_agent_chains', wraps=chains._build_agent_chains) as mock_build:
+            first = chains.get_agent_chains()
+            second = chains.get_agent_chains()
+        mock_build.assert_called_once()
+        self.assertIs(first, second)
+        self.assertIn("Orchestrator", first)
+
+    @unittest.mock.patch('chains._AGENT_CHAINS', None)
+    @unittest.mock.patch('chains.llm', None)
+    @unittest.mock.patch('chains.create_llm', return_value=None)
+    def test_agent_chains_require_api_key(self, mock_create_llm):
+        """Unit: Building chains without an LLM raises instead of caching."""
+        import chains
+        with self.assertRaises(RuntimeError):
+            chains.get_agent_chains()
+        self.assertIsNone(chains._AGENT_CHAINS)
+
+    @unittest.mock.patch('chains._AGENT_CHAINS', None)
+    @unittest.mock.patch('chains.llm', None)
+    @unittest.mock.patch('chains.create_llm')
+    def test_llm_built_with_chains(self, mock_create_llm):
+        """Unit: The LLM is created on first use of the chains, not at import."""
+        import chains
+        chains.get_agent_chains()
+        mock_create_llm.assert_called_once()
+        self.assertIs(chains.llm, mock_create_llm.return_value)
+
+    @unittest.mock.patch('chains._AGENT_CHAINS', {"CEO": unittest.mock.MagicMock()})
+    @unittest.mock.patch('chains._AGENT_CHAINS_LOCK', None)
+    @unittest.mock.patch('chains.llm', unittest.mock.MagicMock())
+    @unittest.mock.patch('chains.http_client', None)
+    def test_chains_reset_after_fork(self):
+        """Unit: A forked worker gets its own HTTP client and rebuilds its LLM and chains on first use."""
+        import chains
+        chains._reset_after_fork()
+        self.assertIsNotNone(chains.http_client)
+        self.assertIsNone(chains.llm)
+        self.assertIsNone(chains._AGENT_CHAINS)
+        chains.http_client.close()
+
+    @unittest.mock.patch('chains._AGENT_CHAINS', None)
+    @unittest.mock.patch('chains.llm', unittest.mock.MagicMock())
+    def test_warm_up_builds_chains_without_llm_calls(self):
+        """Unit: Warm-up builds every chain and renders its prompt without calling the LLM."""
+        import chains
+        from graph_orchestrator import warm_up
+        warm_up()
+        self.assertIn("Orchestrator", chains._AGENT_CHAINS)
+        chains.llm.invoke.assert_not_called()
+
+    @unittest.mock.patch('chains._AGENT_CHAINS', None)
+    @unittest.mock.patch('chains.llm', None)
+    @unittest.mock.patch('chains.create_llm', return_value=None)
+    def test_warm_up_without_api_key(self, mock_create_llm):
+        """Unit: Warm-up is a no-op when no LLM is configured."""
+        from graph_orchestrator import warm_up
+        warm_up()
+
+    @unittest.mock.patch('chains.time.monotonic')
+    def test_llm_cache_ttl_and_eviction(self, mock_monotonic):
+        """Unit: LLM cache entries expire after the TTL and evict least recently used."""
+        from chains import TTLLLMCache
+        cache = TTLLLMCache(maxsize=2, ttl=10)
+        mock_monotonic.return_value = 0
+        cache.update("CEO prompt", "model", ["plan"])
+        self.assertEqual(cache.lookup("CEO prompt", "model"), ["plan"])
+        self.assertIsNone(cache.lookup("CEO prompt", "other-model"))
+        cache.update("HR prompt", "model", ["hire"])
+        cache.update("IT prompt", "model", ["fix"])
+        self.assertIsNone(cache.lookup("CEO prompt", "model"))
+        mock_monotonic.return_value = 11
+        self.assertIsNone(cache.lookup("HR prompt", "model"))
+
+    def test_orchestrator_prompt_static_prefix(self):
+        """Unit: Shared preamble and static persona are sent verbatim as the leading system message."""
+        from chains import create_agent, create_orchestrator
+        from prompts import COMPANY_CONTEXT
+        chain = create_orchestrator(unittest.mock.MagicMock())
+        messages = chain.first.invoke({"task": "Plan", "history": ""}).to_messages()
+        self.assertEqual(messages[0].type, "system")
+        self.assertTrue(messages[0].content.startswith(COMPANY_CONTEXT))
+        self.assertTrue(messages[0].content.endswith(AGENT_PROMPTS["Orchestrator"]))
+        agent_messages = create_agent(unittest.mock.MagicMock(), "CEO").first.invoke({"task": "Plan"}).to_messages()
+        self.assertTrue(agent_messages[0].content.startswith(COMPANY_CONTEXT))
+        self.assertIn("Plan", messages[-1].content)
+
+    def test_orchestrator_parser(self):
+        """Unit: Router output parses with orjson as plain JSON, inside markdown fences, or after prose."""
+        from chains import OrjsonOutputParser
+        parser = OrjsonOutputParser()
+        self.assertEqual(parser.parse('{"agent": "CEO", "subtask": "Plan"}'), {"agent": "CEO", "subtask": "Plan"})
+        with unittest.mock.patch('chains.JsonOutputParser.parse_result') as mock_stock_parse:
+            self.assertEqual(parser.parse('```json\n{"agent": "FINISH"}\n```'), {"agent": "FINISH"})
+            fenced_plan = 'Plan:\n```\n{"parallel": [{"agent": "HR", "subtask": "Hire"}]}\n```'
+            self.assertEqual(parser.parse(fenced_plan), {"parallel": [{"agent": "HR", "subtask": "Hire"}]})
+            self.assertEqual(parser.parse('Routing to CEO: {"agent": "CEO", "subtask": "Plan"}'), {"agent": "CEO", "subtask": "Plan"})
+        mock_stock_parse.assert_not_called()
+
+    def test_orchestrator_structured_output(self):
+        """Unit: The Orchestrator routes through a tool call and falls back to JSON text without one."""
+        from langchain_core.language_models import FakeListChatModel
+        from langchain_core.runnables import RunnableLambda
+        from chains import create_orchestrator, ROUTER_SCHEMA
+        route = {"agent": "CEO", "subtask": "Plan"}
+        llm = FakeListChatModel(responses=['{"agent": "FINISH"}'])
+        with unittest.mock.patch.object(FakeListChatModel, 'with_structured_output', return_value=RunnableLambda(lambda prompt: route)) as mock_structured:
+            self.assertEqual(create_orchestrator(llm).invoke({"task": "Plan", "history": ""}), route)
+        mock_structured.assert_called_once_with(ROUTER_SCHEMA, method="function_calling")
+        with unittest.mock.patch.object(FakeListChatModel, 'with_structured_output', return_value=RunnableLambda(lambda prompt: None)):
+            self.assertEqual(create_orchestrator(llm).invoke({"task": "Plan", "history": ""}), {"agent": "FINISH"})
+
+        def time_out(prompt):
+            raise TimeoutError("provider timed out")
+        fallback_llm = FakeListChatModel(responses=['{"agent": "FINISH"}'])
+        with unittest.mock.patch.object(FakeListChatModel, 'with_structured_output', return_value=RunnableLambda(time_out)):
+            with self.assertRaises(TimeoutError):
+                create_orchestrator(fallback_llm).invoke({"task": "Plan", "history": ""})
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_with_langchain_success(self, mock_get_chains):
         """Unit: LangChain orchestration succeeds."""
         mock_chains = {
-            "Orchestration": unittest.mock.MagicMock(),
+            "Orchestrator": unittest.mock.MagicMock(),
             "CEO": unittest.mock.MagicMock()
         }
-        mock_chains["Orchestration"].invoke.return_value = {"agent": "CEO", "subtask": "Test", "chain_next": False}
+        mock_chains["Orchestrator"].invoke.side_effect = [{"agent": "CEO", "subtask": "Test"}, {"agent": "FINISH"}]
         mock_chains["CEO"].invoke.return_value.content = "CEO Response"
-        mock_build_chains.return_value = mock_chains
+        mock_get_chains.return_value = mock_chains
 
         result = orchestrate_with_langchain("Test task")
         self.assertIn("CEO", str(result['agents_involved']))
         self.assertEqual(result['response'], "CEO Response")
 
-    @unittest.mock.patch('app._build_agent_chains')
-    def test_orchestrate_with_chaining(self, mock_build_chains):
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_with_chaining(self, mock_get_chains):
         """Unit: LangChain orchestration with chaining."""
         mock_chains = {
-            "Orchestration": unittest.mock.MagicMock(),
+            "Orchestrator": unittest.mock.MagicMock(),
             "Manager": unittest.mock.MagicMock(),
             "Architect": unittest.mock.MagicMock()
         }
         
-        mock_chains["Orchestration"].invoke.return_value = {"agent": "Manager", "subtask": "Plan the project", "chain_next": True, "next_agent": "Architect"}
+        mock_chains["Orchestrator"].invoke.side_effect = [
+            {"agent": "Manager", "subtask": "Plan the project"},
+            {"agent": "Architect", "subtask": "Design the system"},
+            {"agent": "FINISH"}
+        ]
         mock_chains["Manager"].invoke.return_value.content = "Project plan"
         mock_chains["Architect"].invoke.return_value.content = "System design"
-        mock_build_chains.return_value = mock_chains
+        mock_get_chains.return_value = mock_chains
 
         result = orchestrate_with_langchain("Develop a new feature")
         self.assertIn("Manager", str(result['agents_involved']))
         self.assertIn("Architect", str(result['agents_involved']))
         self.assertEqual(result['response'], "System design")
 
-    @unittest.mock.patch('app.llm')
-    def test_orchestrate_with_langchain_fallback(self, mock_llm):
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_agent_handoff_skips_router(self, mock_get_chains):
+        """Unit: A <NEXT> tag routes straight to the named agent without asking the Orchestrator."""
+        from langchain_core.messages import AIMessage
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Manager": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "Architect", "subtask": "Design it"}
+        mock_chains["Architect"].invoke.return_value = AIMessage(content="System design\n<NEXT>Manager</NEXT>")
+        mock_chains["Manager"].invoke.return_value = AIMessage(content="Rollout plan\n<NEXT>DONE</NEXT>")
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Build a new feature")
+        self.assertEqual(result['response'], "Rollout plan")
+        self.assertEqual(result['agents_involved'], ["Orchestrator", "Architect", "Manager"])
+        mock_chains["Orchestrator"].invoke.assert_called_once()
+        mock_chains["Manager"].invoke.assert_called_once_with({"task": "Original request: Build a new feature\n\nArchitect replied: System design"})
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_handoffs_stop_at_max_chains(self, mock_get_chains):
+        """Unit: Agents handing off back and forth stop once max_chains agents have replied."""
+        from langchain_core.messages import AIMessage
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Manager": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "Architect", "subtask": "Design it"}
+        mock_chains["Architect"].invoke.return_value = AIMessage(content="Design\n<NEXT>Manager</NEXT>")
+        mock_chains["Manager"].invoke.return_value = AIMessage(content="Plan\n<NEXT>Architect</NEXT>")
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Build a new feature", max_chains=3)
+        self.assertEqual(result['agents_involved'], ["Orchestrator", "Architect", "Manager", "Architect"])
+        self.assertEqual(result['response'], "Design")
+        mock_chains["Orchestrator"].invoke.assert_called_once()
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_parallel_plan_stops_at_max_chains(self, mock_get_chains):
+        """Unit: A parallel plan only runs as many assignments as max_chains leaves room for."""
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Accountant": unittest.mock.MagicMock(),
+            "HR": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {"parallel": [
+            {"agent": "Architect", "subtask": "Design the system"},
+            {"agent": "Accountant", "subtask": "Budget the project"},
+            {"agent": "HR", "subtask": "Staff the team"}
+        ]}
+        mock_chains["Architect"].invoke.return_value.content = "System design"
+        mock_chains["Accountant"].invoke.return_value.content = "Budget"
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Design, budget and staff a new feature", max_chains=2)
+        self.assertEqual(result['agents_involved'], ["Orchestrator", "Architect", "Accountant"])
+        self.assertEqual(result['response'], "Architect: System design\n\nAccountant: Budget")
+        mock_chains["HR"].invoke.assert_not_called()
+        mock_chains["Orchestrator"].invoke.assert_called_once()
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_confident_keyword_route_skips_router(self, mock_get_chains):
+        """Unit: Clear keyword evidence sends the task straight to the agent without a routing call."""
+        from langchain_core.messages import AIMessage
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Accountant": unittest.mock.MagicMock()
+        }
+        mock_chains["Accountant"].invoke.return_value = AIMessage(content="Budget ready\n<NEXT>DONE</NEXT>")
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Reconcile the budget and invoices before the audit")
+        self.assertEqual(result['response'], "Budget ready")
+        self.assertEqual(result['agents_involved'], ["Accountant"])
+        mock_chains["Orchestrator"].invoke.assert_not_called()
+        mock_chains["Accountant"].invoke.assert_called_once_with({"task": "Reconcile the budget and invoices before the audit"})
+
+    @unittest.mock.patch('routing.score_agents', wraps=routing.score_agents)
+    @unittest.mock.patch('app.log_message')
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_first_hop_logged(self, mock_get_chains, mock_log, mock_score):
+        """Unit: The first hop the graph took and its keyword scores are logged, scoring the task once."""
+        from langchain_core.messages import AIMessage
+        mock_chains = {"Accountant": unittest.mock.MagicMock()}
+        mock_chains["Accountant"].invoke.return_value = AIMessage(content="Budget ready\n<NEXT>DONE</NEXT>")
+        mock_get_chains.return_value = mock_chains
+
+        orchestrate_with_langchain("Reconcile the budget and invoices before the audit")
+        message = mock_log.call_args_list[0][0][1]
+        self.assertIn("keyword route to Accountant", message)
+        self.assertIn("'Accountant': 3", message)
+        mock_score.assert_called_once()
+
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_SIZE', 4096)
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_routes_cached_by_routing_input(self, mock_get_chains):
+        """Unit: A repeated task and history reuse earlier routing decisions; a new history asks the Orchestrator."""
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "CEO": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.side_effect = [
+            {"agent": "CEO", "subtask": "Set direction"}, {"agent": "FINISH"}, {"agent": "FINISH"}
+        ]
+        mock_chains["CEO"].invoke.return_value.content = "Direction set"
+        mock_get_chains.return_value = mock_chains
+
+        orchestrate_with_langchain("Set company direction")
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 2)
+
+        _result_cache.clear()
+        result = orchestrate_with_langchain("set  company DIRECTION")
+        self.assertEqual(result['response'], "Direction set")
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 2)
+
+        _result_cache.clear()
+        mock_chains["CEO"].invoke.return_value.content = "New direction"
+        orchestrate_with_langchain("Set company direction")
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 3)
+        self.assertEqual(mock_chains["CEO"].invoke.call_count, 3)
+
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_SIZE', 4096)
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_route_without_subtask(self, mock_get_chains):
+        """Unit: A routing call without a subtask hands the agent the whole task and is cached."""
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "CEO": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.side_effect = [{"agent": "CEO"}, {"agent": "FINISH"}]
+        mock_chains["CEO"].invoke.return_value.content = "Direction set"
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Set company direction")
+        self.assertEqual(result['response'], "Direction set")
+        self.assertIn("Set company direction", mock_chains["CEO"].invoke.call_args[0][0]["task"])
+        self.assertEqual(len(_router_cache), 2)
+
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_SIZE', 4096)
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_bad_routes_not_cached(self, mock_get_chains):
+        """Unit: A routing decision the graph can't follow is not cached, so a retry asks the Orchestrator again."""
+        mock_chains = {"Orchestrator": unittest.mock.MagicMock()}
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "Janitor", "subtask": "Mop"}
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Clean the office")
+        self.assertIn("Fallback", result['steps'][0])
+        orchestrate_with_langchain("Clean the office")
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 2)
+        self.assertEqual(len(_router_cache), 0)
+
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_SIZE', 4096)
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_fused_answers_not_cached(self, mock_get_chains):
+        """Unit: A routing reply that carries the agent's answer is never replayed from the router cache."""
+        mock_chains = {"Orchestrator": unittest.mock.MagicMock()}
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "CEO", "subtask": "Plan", "response": "The plan"}
+        mock_get_chains.return_value = mock_chains
+
+        orchestrate_with_langchain("Write the plan")
+        _result_cache.clear()
+        orchestrate_with_langchain("Write the plan")
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 2)
+
+    def test_router_cache_off_by_default(self):
+        """Unit: The router cache is off unless LANGCHAIN_TEMP is 0."""
+        import graph_orchestrator
+        self.assertEqual(graph_orchestrator.ROUTER_CACHE_SIZE > 0, graph_orchestrator.LANGCHAIN_TEMP == 0)
+
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_SIZE', 4096)
+    @unittest.mock.patch('graph_orchestrator.ROUTER_CACHE_TTL', 60.0)
+    @unittest.mock.patch('graph_orchestrator.time.monotonic')
+    def test_router_cache_ttl(self, mock_monotonic):
+        """Unit: Cached routing decisions expire after the TTL."""
+        from graph_orchestrator import get_cached_route, store_cached_route
+        mock_monotonic.return_value = 100.0
+        store_cached_route(b"key", {"agent": "FINISH"})
+        mock_monotonic.return_value = 159.0
+        self.assertEqual(get_cached_route(b"key"), {"agent": "FINISH"})
+        mock_monotonic.return_value = 160.0
+        self.assertIsNone(get_cached_route(b"key"))
+
+    def test_history_prefix_is_stable(self):
+        """Unit: Rendered history only grows at the end from one hop to the next."""
+        from langchain_core.messages import AIMessage, HumanMessage
+        from graph_orchestrator import format_history
+        messages = [HumanMessage(content="Plan it"), AIMessage(content="Plan", id="run-1")]
+        first = format_history(messages)
+        second = format_history(messages + [HumanMessage(content="Budget it"), AIMessage(content="Budget", id="run-2")])
+        self.assertTrue(second.startswith(first))
+        self.assertNotIn("run-1", second)
+
+    @unittest.mock.patch('graph_orchestrator.ORCHESTRATOR_HISTORY_MESSAGES', 2)
+    def test_history_is_trimmed(self):
+        """Unit: The Orchestrator only sees the most recent messages of a long chain."""
+        from langchain_core.messages import AIMessage, HumanMessage
+        from graph_orchestrator import trim_history
+        messages = [HumanMessage(content="Plan it"), AIMessage(content="Plan"), HumanMessage(content="Budget it"), AIMessage(content="Budget")]
+        history = trim_history(messages)
+        self.assertTrue(history.startswith("(2 earlier messages omitted)"))
+        self.assertNotIn("Plan", history)
+        self.assertIn("Response: Budget", history)
+
+    @unittest.mock.patch('graph_orchestrator.ORCHESTRATOR_HISTORY_CHARS', 10)
+    def test_history_clips_earlier_replies(self):
+        """Unit: Earlier replies are clipped for the Orchestrator while the latest stays whole."""
+        from langchain_core.messages import AIMessage, HumanMessage
+        from graph_orchestrator import trim_history
+        messages = [HumanMessage(content="Plan it"), AIMessage(content="A very long plan reply"), AIMessage(content="A very long budget reply")]
+        history = trim_history(messages)
+        self.assertIn("Response: A very lon [...]", history)
+        self.assertIn("Response: A very long budget reply", history)
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrator_direct_response(self, mock_get_chains):
+        """Unit: A router reply that includes the answer finishes without an agent call."""
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Secretary": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {
+            "agent": "Secretary", "subtask": "Draft the memo", "response": "Memo draft", "chain_next": False
+        }
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Write a memo")
+        self.assertEqual(result['response'], "Memo draft")
+        self.assertIn("Secretary", result['agents_involved'])
+        mock_chains["Orchestrator"].invoke.assert_called_once()
+        mock_chains["Secretary"].invoke.assert_not_called()
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_parallel_fan_out(self, mock_get_chains):
+        """Unit: Independent agents returned under 'parallel' all run in one hop."""
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Accountant": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.side_effect = [
+            {"parallel": [
+                {"agent": "Architect", "subtask": "Design the system"},
+                {"agent": "Accountant", "subtask": "Budget the project"}
+            ]},
+            {"agent": "FINISH"}
+        ]
+        mock_chains["Architect"].invoke.return_value.content = "System design"
+        mock_chains["Accountant"].invoke.return_value.content = "Budget"
+        mock_get_chains.return_value = mock_chains
+
+        result = orchestrate_with_langchain("Design and budget a new feature")
+        self.assertIn("Architect", result['agents_involved'])
+        self.assertIn("Accountant", result['agents_involved'])
+        self.assertEqual(result['response'], "Architect: System design\n\nAccountant: Budget")
+        mock_chains["Architect"].invoke.assert_called_once_with({"task": "Design the system"})
+        mock_chains["Accountant"].invoke.assert_called_once_with({"task": "Budget the project"})
+        self.assertEqual(mock_chains["Orchestrator"].invoke.call_count, 2)
+
+    @unittest.mock.patch('app.enqueue_task_record')
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_stream_events(self, mock_get_chains, mock_enqueue):
+        """Unit: The stream endpoint emits each agent reply, then the final result."""
+        import orjson
+        from langchain_core.messages import AIMessage
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Manager": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "Architect", "subtask": "Design it"}
+        mock_chains["Architect"].invoke.return_value = AIMessage(content="System design\n<NEXT>Manager</NEXT>")
+        mock_chains["Manager"].invoke.return_value = AIMessage(content="Rollout plan\n<NEXT>DONE</NEXT>")
+        mock_get_chains.return_value = mock_chains
+
+        rv = self.client.post('/orchestrate/stream', json={'task': 'Build a new feature'})
+        self.assertEqual(rv.mimetype, 'text/event-stream')
+        events = [orjson.loads(line[len(b"data: "):]) for line in rv.data.split(b"\n\n") if line]
+        self.assertEqual(events[0], {"agent": "Architect", "response": "System design"})
+        self.assertEqual(events[1], {"agent": "Manager", "response": "Rollout plan"})
+        self.assertTrue(events[2]['done'])
+        self.assertEqual(events[2]['response'], "Rollout plan")
+        self.assertEqual(events[2]['agents_involved'], ["Orchestrator", "Architect", "Manager"])
+        mock_enqueue.assert_called_once()
+
+    @unittest.mock.patch('app.enqueue_task_record')
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_stream_tokens(self, mock_get_chains, mock_enqueue):
+        """Unit: Agent tokens stream as deltas without the trailing <NEXT> tag."""
+        import orjson
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="Hire two engineers <NEXT>DONE</NEXT>")]))
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "HR": RunnableLambda(lambda inputs: inputs["task"]) | model
+        }
+        mock_chains["Orchestrator"].invoke.return_value = {"agent": "HR", "subtask": "Plan hiring"}
+        mock_get_chains.return_value = mock_chains
+
+        rv = self.client.post('/orchestrate/stream', json={'task': 'Grow the team'})
+        events = [orjson.loads(line[len(b"data: "):]) for line in rv.data.split(b"\n\n") if line]
+        deltas = "".join(event['delta'] for event in events if 'delta' in event)
+        self.assertEqual(deltas.strip(), "Hire two engineers")
+        self.assertIn({"agent": "HR", "response": "Hire two engineers"}, events)
+        self.assertEqual(events[-1]['response'], "Hire two engineers")
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_sensitive_task_redacted_without_llm(self, mock_get_chains):
+        """Unit: Sensitive tasks are redacted by SecretService and never reach the LLM."""
+        result = orchestrate_with_langchain("Rotate the API_KEY=sk-123 and password: hunter2")
+        self.assertEqual(result['agents_involved'], ["SecretService"])
+        self.assertNotIn("sk-123", result['response'])
+        self.assertNotIn("hunter2", result['response'])
+        self.assertIn("[REDACTED]", result['response'])
+
+        result = orchestrate_with_langchain("How do I reset my password")
+        self.assertEqual(result['agents_involved'], ["SecretService"])
+        mock_get_chains.assert_not_called()
+
+    @unittest.mock.patch('app.run_graph')
+    def test_repeated_task_served_from_cache(self, mock_run_graph):
+        """Unit: Identical tasks (ignoring case and spacing) within the TTL reuse the first result."""
+        mock_run_graph.return_value = {"response": "Cached answer", "agents_involved": ["CEO"], "first_hop": "CEO", "keyword_scores": {"CEO": 2}}
+        first = orchestrate_with_langchain("Quarterly plan")
+        first['steps'].append("mutated by caller")
+        second = orchestrate_with_langchain("  quarterly   PLAN ")
+        mock_run_graph.assert_called_once()
+        self.assertEqual(second['response'], "Cached answer")
+        self.assertNotIn("mutated by caller", second['steps'])
+
+        stats = self.client.get('/cache/stats').get_json()
+        self.assertEqual(stats, {"hits": 1, "misses": 1, "size": 1})
+
+    def test_semantic_cache_similarity(self):
+        """Unit: Semantic cache returns results only for sufficiently similar tasks."""
+        from semantic_cache import SemanticCache
+        embeddings = unittest.mock.MagicMock()
+        vectors = {"standup monday": [1.0, 0.0], "monday standup": [0.99, 0.1], "budget": [0.0, 1.0]}
+        embeddings.embed_query.side_effect = lambda task: vectors[task]
+        cache = SemanticCache(embeddings, threshold=0.92)
+        cache.store(cache.embed("standup monday"), {"response": "Scheduled"}, 5)
+        self.assertEqual(cache.lookup(cache.embed("monday standup"), 5), {"response": "Scheduled"})
+        self.assertIsNone(cache.lookup(cache.embed("monday standup"), 3))
+        self.assertIsNone(cache.lookup(cache.embed("budget"), 5))
+
+    @unittest.mock.patch('semantic_cache.time.monotonic')
+    def test_semantic_cache_ttl(self, mock_monotonic):
+        """Unit: Semantic cache entries expire after the TTL."""
+        from semantic_cache import SemanticCache
+        embeddings = unittest.mock.MagicMock()
+        embeddings.embed_query.return_value = [1.0, 0.0]
+        cache = SemanticCache(embeddings, ttl=60.0)
+        mock_monotonic.return_value = 100.0
+        cache.store(cache.embed("standup"), {"response": "Scheduled"}, 5)
+        mock_monotonic.return_value = 159.0
+        self.assertEqual(cache.lookup(cache.embed("standup"), 5), {"response": "Scheduled"})
+        mock_monotonic.return_value = 160.0
+        self.assertIsNone(cache.lookup(cache.embed("standup"), 5))
+
+    def test_keyword_routing(self):
+        """Unit: Keyword router scores every match in one pass, ignoring case and plurals."""
+        from routing import route_task, score_agents
+        scores = score_agents("Prepare the BUDGET and invoices for the tax audit before the board meeting")
+        self.assertEqual(scores["Accountant"], 4)
+        self.assertEqual(route_task("Sketch the architecture for the new portal"), "Architect")
+        self.assertIsNone(route_task("Write a short poem"))
+
+    def test_architect_keywords_match_persona(self):
+        """Unit: System design requests route to the Architect; building work does not."""
+        from routing import keyword_route
+        agent_name, scores = keyword_route("Draft the system design and data models for the billing integration")
+        self.assertEqual(agent_name, "Architect")
+        self.assertEqual(scores["Architect"], 3)
+        self.assertEqual(keyword_route("Review the scalability of our architecture diagram")[0], "Architect")
+        self.assertNotIn("Architect", keyword_route("Plan the office renovation and new floor plan")[1])
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_async_graph_fan_out(self, mock_get_chains):
+        """Unit: The async graph awaits agents and gathers parallel assignments."""
+        import asyncio
+        from graph_orchestrator import arun_graph
+        mock_chains = {
+            "Orchestrator": unittest.mock.MagicMock(),
+            "Architect": unittest.mock.MagicMock(),
+            "Accountant": unittest.mock.MagicMock()
+        }
+        mock_chains["Orchestrator"].ainvoke = unittest.mock.AsyncMock(side_effect=[
+            {"parallel": [
+                {"agent": "Architect", "subtask": "Design the system"},
+                {"agent": "Accountant", "subtask": "Budget the project"}
+            ]},
+            {"agent": "FINISH"}
+        ])
+        mock_chains["Architect"].ainvoke = unittest.mock.AsyncMock(return_value=unittest.mock.MagicMock(content="System design"))
+        mock_chains["Accountant"].ainvoke = unittest.mock.AsyncMock(return_value=unittest.mock.MagicMock(content="Budget"))
+        mock_get_chains.return_value = mock_chains
+
+        result = asyncio.run(arun_graph("Design and budget a new feature"))
+        self.assertEqual(result['agents_involved'], ["Orchestrator", "Architect", "Accountant"])
+        self.assertEqual(result['response'], "Architect: System design\n\nAccountant: Budget")
+        mock_chains["Architect"].invoke.assert_not_called()
+
+    @unittest.mock.patch('graph_orchestrator.get_agent_chains')
+    def test_orchestrate_with_langchain_fallback(self, mock_get_chains):
         """Unit: LangChain orchestration falls back on error."""
-        mock_llm.side_effect = Exception("Chain error")
+        mock_get_chains.side_effect = Exception("Chain error")
 
         result = orchestrate_with_langchain("Test task")
         self.assertIn("Fallback", result['steps'][0])
         self.assertIn("Error", result['response'])
 
-    @unittest.mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test_key"})
-    @unittest.mock.patch('langchain_google_genai.ChatGoogleGenerativeAI')
+class TestLLMSelection(unittest.TestCase):
+    @unittest.mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test_key", "XAI_API_KEY": ""})
+    @unittest.mock.patch('chains.ChatGoogleGenerativeAI')
     def test_google_llm_selection(self, mock_google_llm):
         """Unit: Selects Google LLM when GOOGLE_API_KEY is set."""
-        import importlib
-        import app
-        importlib.reload(app)
-        mock_google_llm.assert_called_with(model="gemini-pro", google_api_key="test_key", temperature=0.7)
+        from chains import create_llm, HTTP_LIMITS
+        create_llm()
+        mock_google_llm.assert_called_with(model="gemini-pro", google_api_key="test_key", temperature=0.7,
+                                           client_args={"http2": True, "limits": HTTP_LIMITS})
 
     @unittest.mock.patch.dict(os.environ, {"XAI_API_KEY": "test_key"})
-    @unittest.mock.patch('langchain_xai.ChatXAI')
+    @unittest.mock.patch('chains.ChatXAI')
     def test_xai_llm_selection(self, mock_xai_llm):
         """Unit: Selects XAI LLM when XAI_API_KEY is set."""
-        import importlib
-        import app
-        importlib.reload(app)
-        mock_xai_llm.assert_called_with(model="grok-beta", xai_api_key="test_key", temperature=0.7)
+        from chains import create_llm, http_client
+        create_llm()
+        mock_xai_llm.assert_called_with(model="grok-beta", xai_api_key="test_key", temperature=0.7, http_client=http_client)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file